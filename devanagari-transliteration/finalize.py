@@ -13,16 +13,81 @@ LaTeX Finalization
 @author: Hrishikesh Terdalkar
 """
 
+import io
 import os
 import re
+import mmap
+import codecs
+import pickle
 import argparse
-from typing import Callable, List
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Iterable, Iterator, NamedTuple, Tuple
 from indic_transliteration.sanscript import transliterate
 from indic_transliteration import sanscript
 
 ###############################################################################
 
 
+@functools.lru_cache(maxsize=None)
+def _get_scheme_map(_from: str, _to: str) -> sanscript.SchemeMap:
+    """Build (and cache) the scheme map from one scheme to another"""
+    return sanscript.SchemeMap(
+        sanscript.SCHEMES[_from],
+        sanscript.SCHEMES[_to]
+    )
+
+
+@functools.lru_cache(maxsize=8192)
+def _cached_transliterate(
+    data: str,
+    _from: str,
+    _to: str,
+    scheme_map: sanscript.SchemeMap or None = None
+) -> str:
+    """Memoized `transliterate` for the (repetitive) text within tags"""
+    if scheme_map is None:
+        scheme_map = _get_scheme_map(_from, _to)
+    return transliterate(data, _from, _to, scheme_map)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_between(start_pattern: str, end_pattern: str) -> re.Pattern:
+    """Compile (and cache) the regexp matching text between two patterns"""
+    return re.compile(
+        "%s(.*?)%s" % (re.escape(start_pattern), re.escape(end_pattern)),
+        flags=re.DOTALL
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_chain(delimiters: Tuple[Tuple[str, str], ...]) -> re.Pattern:
+    """Compile (and cache) the regexp matching text between any of the
+    pairs of start and end patterns
+
+    The match for the i-th pair has `lastindex` `2 * i + 1`, and the text
+    between the patterns is in the group `2 * i + 2`.
+    """
+    # common literal prefix of the start tags (usually "\\") is kept outside
+    # the alternation to retain the fast prefix search of the regexp engine
+    # NOTE: `re` is preferred over `re2` (google-re2) deliberately, as the
+    # latter runs `sub` with a callback in Python, and converts every match
+    # to and from UTF-8, which makes it much slower for tagged documents
+    # Similarly, an Aho-Corasick automaton (pyahocorasick) over the start
+    # tags is slower, as every hit is handed back to Python, while `re`
+    # scans for the literal prefix in C
+    prefix = os.path.commonprefix([start for start, _ in delimiters])
+    patterns = [
+        "(%s(.*?)%s)" % (re.escape(start[len(prefix):]), re.escape(end))
+        for start, end in delimiters
+    ]
+    return re.compile(
+        "%s(?:%s)" % (re.escape(prefix), "|".join(patterns)),
+        flags=re.DOTALL
+    )
+
+
 def transliterate_between(
     text: str,
     from_scheme: str,
@@ -30,6 +95,7 @@ def transliterate_between(
     start_pattern: str,
     end_pattern: str,
     post_hook: Callable[[str], str] or None = None,
+    scheme_map: sanscript.SchemeMap or None = None,
 ) -> str:
     """Transliterate the text appearing between two patterns
 
@@ -55,7 +121,12 @@ def transliterate_between(
         Pattern describing the end tag
     post_hook : Callable[[str], str], optional
         Function to be applied on the text within tags after transliteration
-        The default is `lambda x: x`.
+        If `None`, the transliterated text is used as it is.
+        The default is None.
+    scheme_map : sanscript.SchemeMap, optional
+        Pre-computed scheme map from `from_scheme` to `to_scheme`
+        If `None`, a cached scheme map for the two schemes is used.
+        The default is None.
 
     Returns
     -------
@@ -66,17 +137,28 @@ def transliterate_between(
     if from_scheme == to_scheme:
         return text
 
-    if post_hook is None:
-        post_hook = lambda x: x
-
-    def transliterate_match(matchobj):
-        target = matchobj.group(1)
-        replacement = transliterate(target, from_scheme, to_scheme)
-        replacement = post_hook(replacement)
-        return f"{start_pattern}{replacement}{end_pattern}"
+    if start_pattern not in text:
+        return text
 
-    pattern = "%s(.*?)%s" % (re.escape(start_pattern), re.escape(end_pattern))
-    return re.sub(pattern, transliterate_match, text, flags=re.DOTALL)
+    # callback is chosen once, to avoid calling an identity post-hook
+    if post_hook is None:
+        def transliterate_match(matchobj):
+            target = matchobj.group(1)
+            replacement = _cached_transliterate(
+                target, from_scheme, to_scheme, scheme_map
+            )
+            return start_pattern + replacement + end_pattern
+    else:
+        def transliterate_match(matchobj):
+            target = matchobj.group(1)
+            replacement = _cached_transliterate(
+                target, from_scheme, to_scheme, scheme_map
+            )
+            replacement = post_hook(replacement)
+            return start_pattern + replacement + end_pattern
+
+    pattern = _compile_between(start_pattern, end_pattern)
+    return pattern.sub(transliterate_match, text)
 
 
 ###############################################################################
@@ -128,46 +210,203 @@ def latex_transliteration(
 # Apply Chain of Transliterations
 
 
+class TransliterationRule(NamedTuple):
+    """Transliteration of the text between a pair of tags in a chain
+
+    Fields are the keyword arguments of `transliterate_between` (except
+    `text`), so a rule can be created from a configuration dictionary as
+    `TransliterationRule(**config)`.
+    """
+    from_scheme: str or None
+    to_scheme: str or None
+    start_pattern: str
+    end_pattern: str
+    post_hook: Callable[[str], str] or None = None
+    scheme_map: sanscript.SchemeMap or None = None
+
+
+def _as_chain(
+    transliteration_chain: Iterable[TransliterationRule or dict]
+) -> Tuple[TransliterationRule, ...]:
+    """Convert a chain of rules or configuration dictionaries to rules"""
+    return tuple(
+        rule if isinstance(rule, TransliterationRule)
+        else TransliterationRule(**rule)
+        for rule in transliteration_chain
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _prepare_chain(
+    transliteration_chain: Tuple[TransliterationRule, ...]
+) -> Tuple[re.Pattern or None, dict]:
+    """Resolve (and cache) the regexp and the rules for a chain
+
+    Rules where `from_scheme` and `to_scheme` are the same are skipped, and
+    the scheme maps of the remaining rules are resolved.
+
+    Returns
+    -------
+    Tuple[re.Pattern or None, dict]
+        Regexp matching all the tags (`None` if there is nothing to do),
+        and a mapping from the `lastindex` of a match to the rule
+    """
+    delimiters = []
+    rules = {}
+    for rule in transliteration_chain:
+        if rule.from_scheme == rule.to_scheme:
+            continue
+        if rule.scheme_map is None:
+            rule = rule._replace(
+                scheme_map=_get_scheme_map(rule.from_scheme, rule.to_scheme)
+            )
+        # outer group closes last, hence becomes `lastindex` of the match
+        rules[2 * len(delimiters) + 1] = rule
+        delimiters.append((rule.start_pattern, rule.end_pattern))
+
+    if not rules:
+        return None, rules
+    return _compile_chain(tuple(delimiters)), rules
+
+
+PARALLEL_THRESHOLD = 1024 * 1024
+
+
 def apply_transliteration_chain(
     input_text: str,
-    transliteration_chain: List[List]
+    transliteration_chain: Iterable[TransliterationRule or dict],
+    workers: int = 1
 ):
-    intermediate_text = input_text
-    for transliteration_config in transliteration_chain:
-        intermediate_text = transliterate_between(
-            intermediate_text,
-            **transliteration_config
+    """Apply a chain of transliterations in a single pass over the text
+
+    Every rule in the chain is a `TransliterationRule`, or a dictionary of
+    keyword arguments to `transliterate_between`.
+    Tag patterns of all the rules are combined into a single regexp, and
+    every match is transliterated as per the rule corresponding to the tag
+    that matched.
+
+    If `workers` is more than 1, texts of at least `PARALLEL_THRESHOLD`
+    characters are split into segments (see `split_segments`), which are
+    transliterated in a pool of `workers` processes, provided the chain is
+    picklable. With the `spawn` start method (default on Windows and macOS),
+    this requires the calling script to be guarded by
+    `if __name__ == '__main__':`.
+
+    Parameters
+    ----------
+    input_text : str
+        Input text
+    transliteration_chain : Iterable[TransliterationRule or dict]
+        Transliteration rules
+    workers : int, optional
+        Number of processes to transliterate large texts with
+        The default is 1.
+
+    Returns
+    -------
+    str
+        Text after replacement of text within all the tags
+    """
+    transliteration_chain = _as_chain(transliteration_chain)
+
+    if workers <= 1 or len(input_text) < PARALLEL_THRESHOLD:
+        return _apply_transliteration_chain(input_text, transliteration_chain)
+
+    try:
+        pickle.dumps(transliteration_chain)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return _apply_transliteration_chain(input_text, transliteration_chain)
+
+    delimiters = [
+        (rule.start_pattern, rule.end_pattern)
+        for rule in transliteration_chain
+    ]
+    segment_size = -(-len(input_text) // workers)
+    segments = split_segments(input_text, delimiters, segment_size)
+    if len(segments) == 1:
+        return _apply_transliteration_chain(input_text, transliteration_chain)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return "".join(executor.map(
+            _apply_transliteration_chain,
+            segments,
+            itertools.repeat(transliteration_chain)
+        ))
+
+
+def _apply_transliteration_chain(
+    input_text: str,
+    transliteration_chain: Tuple[TransliterationRule, ...]
+):
+    """Apply a chain of transliterations in a single process"""
+    prepare_chain = _prepare_chain
+    try:
+        hash(transliteration_chain)
+    except TypeError:
+        # unhashable post-hook or scheme map
+        prepare_chain = _prepare_chain.__wrapped__
+    pattern, rules = prepare_chain(transliteration_chain)
+
+    if pattern is None:
+        return input_text
+
+    # complete replacements (including tags) are memoized per call, so that
+    # a repeated tag costs a single dictionary lookup
+    replacements = {}
+
+    def transliterate_match(matchobj):
+        group_index = matchobj.lastindex
+        key = (group_index, matchobj.group(group_index + 1))
+        replacement = replacements.get(key)
+        if replacement is not None:
+            return replacement
+
+        (
+            from_scheme, to_scheme, start_pattern,
+            end_pattern, post_hook, scheme_map
+        ) = rules[group_index]
+        replacement = _cached_transliterate(
+            key[1],
+            from_scheme,
+            to_scheme,
+            scheme_map
         )
-    return intermediate_text
+        if post_hook is not None:
+            replacement = post_hook(replacement)
+        replacement = start_pattern + replacement + end_pattern
+        replacements[key] = replacement
+        return replacement
+
+    return pattern.sub(transliterate_match, input_text)
 
 
 ###############################################################################
 # Example: Devanagari to IAST Chain
 
-DEVANAGARI_TO_IAST_TRANSFORMATIONS = [
-    {
-        "from_scheme": sanscript.DEVANAGARI,
-        "to_scheme": sanscript.IAST,
-        "start_pattern": "\\iast{",
-        "end_pattern": "}"
-    },
-    {
-        "from_scheme": sanscript.DEVANAGARI,
-        "to_scheme": sanscript.IAST,
-        "start_pattern": "\\Iast{",
-        "end_pattern": "}",
-        "post_hook": lambda x: x.title()
-    },
-    {
-        "from_scheme": sanscript.DEVANAGARI,
-        "to_scheme": sanscript.IAST,
-        "start_pattern": "\\IAST{",
-        "end_pattern": "}",
-        "post_hook": lambda x: x.upper()
-    }
-]
-
-def devanagari_to_iast(input_text: str) -> str:
+DEVANAGARI_TO_IAST_TRANSFORMATIONS = (
+    TransliterationRule(
+        from_scheme=sanscript.DEVANAGARI,
+        to_scheme=sanscript.IAST,
+        start_pattern="\\iast{",
+        end_pattern="}"
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.DEVANAGARI,
+        to_scheme=sanscript.IAST,
+        start_pattern="\\Iast{",
+        end_pattern="}",
+        post_hook=str.title
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.DEVANAGARI,
+        to_scheme=sanscript.IAST,
+        start_pattern="\\IAST{",
+        end_pattern="}",
+        post_hook=str.upper
+    )
+)
+
+def devanagari_to_iast(input_text: str, workers: int = 1) -> str:
     """Transliterate parts of the input enclosed in
     \\iast{}, \\Iast{} or \\IAST{} tags from Devanagari to IAST
 
@@ -178,6 +417,9 @@ def devanagari_to_iast(input_text: str) -> str:
     ----------
     input_text : str
         Input text
+    workers : int, optional
+        Number of processes (see `apply_transliteration_chain`)
+        The default is 1.
 
     Returns
     -------
@@ -187,63 +429,64 @@ def devanagari_to_iast(input_text: str) -> str:
 
     return apply_transliteration_chain(
         input_text,
-        DEVANAGARI_TO_IAST_TRANSFORMATIONS
+        DEVANAGARI_TO_IAST_TRANSFORMATIONS,
+        workers=workers
     )
 
 ###############################################################################
 # Example: Bengali to ISO/ITRANS/IAST Chain
 
 
-BENGALI_TRANSFORMATIONS = [
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.ISO,
-        "start_pattern": "\\textiso{",
-        "end_pattern": "}"
-    },
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.ISO,
-        "start_pattern": "\\Iso{",
-        "end_pattern": "}",
-        "post_hook": lambda x: x.title()
-    },
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.ISO,
-        "start_pattern": "\\ISO{",
-        "end_pattern": "}",
-        "post_hook": lambda x: x.upper()
-    },
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.ITRANS,
-        "start_pattern": "\\textitrans{",
-        "end_pattern": "}"
-    },
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.IAST,
-        "start_pattern": "\\textiast{",
-        "end_pattern": "}"
-    },
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.IAST,
-        "start_pattern": "\\Iast{",
-        "end_pattern": "}",
-        "post_hook": lambda x: x.title()
-    },
-    {
-        "from_scheme": sanscript.BENGALI,
-        "to_scheme": sanscript.IAST,
-        "start_pattern": "\\IAST{",
-        "end_pattern": "}",
-        "post_hook": lambda x: x.upper()
-    }
-]
-
-def bengali_to_multiple(input_text: str) -> str:
+BENGALI_TRANSFORMATIONS = (
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.ISO,
+        start_pattern="\\textiso{",
+        end_pattern="}"
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.ISO,
+        start_pattern="\\Iso{",
+        end_pattern="}",
+        post_hook=str.title
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.ISO,
+        start_pattern="\\ISO{",
+        end_pattern="}",
+        post_hook=str.upper
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.ITRANS,
+        start_pattern="\\textitrans{",
+        end_pattern="}"
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.IAST,
+        start_pattern="\\textiast{",
+        end_pattern="}"
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.IAST,
+        start_pattern="\\Iast{",
+        end_pattern="}",
+        post_hook=str.title
+    ),
+    TransliterationRule(
+        from_scheme=sanscript.BENGALI,
+        to_scheme=sanscript.IAST,
+        start_pattern="\\IAST{",
+        end_pattern="}",
+        post_hook=str.upper
+    )
+)
+
+def bengali_to_multiple(input_text: str, workers: int = 1) -> str:
     """Transliterate parts of the input enclosed in
     \\textiast{}, \\Iast{} or \\IAST{} tags from Bengali to IAST
     \\textiso{}, \\Iso{} or \\ISO{} tags from Bengali to ISO
@@ -256,6 +499,9 @@ def bengali_to_multiple(input_text: str) -> str:
     ----------
     input_text : str
         Input text
+    workers : int, optional
+        Number of processes (see `apply_transliteration_chain`)
+        The default is 1.
 
     Returns
     -------
@@ -265,22 +511,34 @@ def bengali_to_multiple(input_text: str) -> str:
 
     return apply_transliteration_chain(
         input_text,
-        BENGALI_TRANSFORMATIONS
+        BENGALI_TRANSFORMATIONS,
+        workers=workers
     )
 
 ###############################################################################
 
+COMMENT_START = "\\begin{comment}"
+COMMENT_END = "\\end{comment}"
+
 
 def remove_comments(input_text: str) -> str:
     """Remove LaTeX Comments"""
-    start = "\\begin{comment}"
-    end = "\\end{comment}"
-    pattern = "%s(.*?)%s" % (re.escape(start), re.escape(end))
-    return re.sub(pattern, '', input_text, flags=re.DOTALL)
+    output = []
+    position = 0
+    while True:
+        start = input_text.find(COMMENT_START, position)
+        if start == -1:
+            break
+        end = input_text.find(COMMENT_END, start + len(COMMENT_START))
+        if end == -1:
+            break
+        output.append(input_text[position:start])
+        position = end + len(COMMENT_END)
+    output.append(input_text[position:])
+    return "".join(output)
 
 ###############################################################################
 
-
 def clean_whitespaces(input_text: str) -> str:
     """Remove trailing whitespaces and consective blank lines
 
@@ -294,9 +552,178 @@ def clean_whitespaces(input_text: str) -> str:
     str
         Output text after whitespace cleaning
     """
-    _text = re.sub(r"[\t\r ]+?\n", "\n", input_text)
-    _text = re.sub("\n\n+", "\n\n", _text, flags=re.DOTALL)
-    return _text
+    lines = input_text.split("\n")
+    # the last line is not terminated by a newline, and is kept as it is
+    last_line = lines.pop()
+
+    output = []
+    # at most two blank lines at the start, and one after any other line
+    blank_budget = 2
+    for line in lines:
+        line = line.rstrip("\t\r ")
+        if line:
+            output.append(line)
+            blank_budget = 1
+        elif blank_budget:
+            output.append(line)
+            blank_budget -= 1
+    output.append(last_line)
+    return "\n".join(output)
+
+
+###############################################################################
+# Segmented Processing
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def find_safe_boundary(text: str, delimiters: List[Tuple[str, str]]) -> int:
+    """Find the last position at which the text can be split safely
+
+    A position is safe if it is right after a blank line, and for every
+    pair of `delimiters`, the last start pattern before the position is
+    closed by an end pattern before the position.
+
+    Parameters
+    ----------
+    text : str
+        Input text
+    delimiters : List[Tuple[str, str]]
+        Pairs of start and end patterns which should not be split
+
+    Returns
+    -------
+    int
+        Position to split the text at
+        `0` if there is no safe position
+    """
+    position = len(text)
+    while True:
+        position = text.rfind("\n\n", 0, position)
+        if position == -1:
+            return 0
+        boundary = position + 2
+        for start, end in delimiters:
+            opening = text.rfind(start, 0, boundary)
+            if opening == -1:
+                continue
+            if text.find(end, opening + len(start), boundary) == -1:
+                position = min(position, opening)
+                break
+        else:
+            return boundary
+
+
+def split_segments(
+    text: str,
+    delimiters: List[Tuple[str, str]],
+    segment_size: int
+) -> List[str]:
+    """Split text into segments of (roughly) the given size at safe positions
+
+    See `find_safe_boundary` for the definition of a safe position.
+    A segment is extended beyond `segment_size` if there is no safe position
+    within it.
+
+    Parameters
+    ----------
+    text : str
+        Input text
+    delimiters : List[Tuple[str, str]]
+        Pairs of start and end patterns which should not be split
+    segment_size : int
+        Desired number of characters in a segment
+
+    Returns
+    -------
+    List[str]
+        Segments of the text
+    """
+    segments = []
+    position = 0
+    while len(text) - position > segment_size:
+        window = segment_size
+        boundary = 0
+        while not boundary and position + window < len(text):
+            boundary = find_safe_boundary(
+                text[position:position + window],
+                delimiters
+            )
+            window *= 2
+        if not boundary:
+            break
+        segments.append(text[position:position + boundary])
+        position += boundary
+    segments.append(text[position:])
+    return segments
+
+
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Read a UTF-8 encoded file in chunks through a memory map
+
+    Chunks are decoded incrementally, so characters spanning two chunks are
+    decoded correctly, and newlines are translated as in text mode.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+    chunk_size : int, optional
+        Number of bytes to decode at a time
+        The default is `CHUNK_SIZE`.
+
+    Yields
+    ------
+    str
+        Chunk of the text
+    """
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(),
+        translate=True
+    )
+    with open(path, 'rb') as f:
+        # empty files can not be memory mapped
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, len(mm), chunk_size):
+                    chunk = decoder.decode(mm[offset:offset + chunk_size])
+                    if chunk:
+                        yield chunk
+    chunk = decoder.decode(b"", final=True)
+    if chunk:
+        yield chunk
+
+
+def read_segments(
+    chunks: Iterable[str],
+    delimiters: List[Tuple[str, str]]
+) -> Iterator[str]:
+    """Accumulate chunks of text and yield segments split at safe positions
+
+    Chunks are accumulated until a safe position (see `find_safe_boundary`)
+    is found, so that every segment can be processed independently.
+
+    Parameters
+    ----------
+    chunks : Iterable[str]
+        Chunks of the text (e.g. from `read_chunks`)
+    delimiters : List[Tuple[str, str]]
+        Pairs of start and end patterns which should not be split
+
+    Yields
+    ------
+    str
+        Segment of the text
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        boundary = find_safe_boundary(buffer, delimiters)
+        if boundary:
+            yield buffer[:boundary]
+            buffer = buffer[boundary:]
+    if buffer:
+        yield buffer
 
 
 ###############################################################################
@@ -313,21 +740,36 @@ if __name__ == '__main__':
     if not os.path.isfile(infile):
         raise FileNotFoundError(f"{infile} does not exist.")
 
-    with open(infile, 'r') as f:
-        input_text = f.read()
-
     # ----------------------------------------------------------------------- #
     # Sample LaTeX Finalization Pipeline
 
-    _text = input_text
+    # input is processed in segments, split outside tags and comments
+    delimiters = [(COMMENT_START, COMMENT_END)] + [
+        (rule.start_pattern, rule.end_pattern)
+        for rule in DEVANAGARI_TO_IAST_TRANSFORMATIONS
+    ]
 
-    _text = devanagari_to_iast(_text)         # Transliteration
-    _text = remove_comments(_text)            # Comment Removal
-    _text = clean_whitespaces(_text)          # Whitespace Cleaning
+    chunks = read_chunks(infile)
+    # opening the output truncates it, so an in-place run reads input first
+    if os.path.exists(outfile) and os.path.samefile(infile, outfile):
+        chunks = list(chunks)
 
-    output_text = _text
+    with open(outfile, 'w', encoding='utf-8', buffering=1 << 20) as fout:
+        # trailing whitespaces of a segment are cleaned along with the next
+        trailing_whitespace = ""
+        for segment in read_segments(chunks, delimiters):
+            _text = segment
 
-    # ----------------------------------------------------------------------- #
+            _text = devanagari_to_iast(_text)         # Transliteration
+            _text = remove_comments(_text)            # Comment Removal
+            _text = clean_whitespaces(
+                trailing_whitespace + _text
+            )                                         # Whitespace Cleaning
 
-    with open(outfile, 'w') as f:
-        f.write(output_text)
+            output_text = _text.rstrip("\t\r \n")
+            trailing_whitespace = _text[len(output_text):]
+            fout.write(output_text)
+
+        fout.write(trailing_whitespace)
+
+    # ----------------------------------------------------------------------- #